@@ -1,7 +1,21 @@
+import io
 import os
 import re
+import sys
+import cmd
+import bisect
+import contextlib
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
+import numpy as np
 from matplotlib import pyplot as plt
 
 
@@ -21,6 +35,80 @@ def extract_timestamp_m4(log_entry):
     else:
         return extract_timestamp_common(log_entry)
 
+###position of the two digit year, month and day in the 21 character m4 timestamp of each layout
+###bracketed m4 layout: [MM/DD/YY HH:MM:SS.fff]   base 3.5 and up: YY/MM/DD HH:MM:SS.fff
+###both layouts share the time of day at HH=9, MM=12, SS=15, fff=18
+M4_BRACKETED_DATE_FIELDS = (6, 0, 3)
+M4_COMMON_DATE_FIELDS = (0, 3, 6)
+M4_TIMESTAMP_DIGITS = [0, 1, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16, 18, 19, 20]
+M4_TIMESTAMP_SEPARATORS = {2: b'/', 5: b'/', 8: b' ', 11: b':', 14: b':', 17: b'.'}
+
+###cuts the fixed width timestamp out of every m4 log line
+###returns the timestamps as a numpy S21 array and a bool array telling which lines use the bracketed layout
+def get_m4_timestamp_slices(lines):
+    bracketed = np.fromiter((line[:1] == '[' for line in lines), dtype=bool, count=len(lines))
+    slices = [line[1:22] if line[:1] == '[' else line[0:21] for line in lines]
+    # non-ASCII characters become '?', which fails the digit checks so those rows go through the guarded fallback
+    slices = np.array([line_slice if line_slice.isascii() else line_slice.encode('ascii', errors='replace')
+                       for line_slice in slices], dtype='S21')
+    # a bracketed timestamp with more or less than 3 fractional digits is not fixed width, those rows are parsed one by one
+    fixed_width = np.fromiter((line[:1] != '[' or line[22:23] == ']' for line in lines), dtype=bool, count=len(lines))
+    return slices, bracketed, fixed_width
+
+###converts a whole S21 array of m4 timestamps to datetime64[us] in one vectorized operation
+###rows that don't fit the fixed width layout come back as NaT
+def parse_m4_timestamp_slices(slices, bracketed):
+    slices = np.asarray(slices, dtype='S21')
+    bracketed = np.asarray(bracketed, dtype=bool)
+    if len(slices) == 0:
+        return np.array([], dtype='datetime64[us]')
+    raw = np.frombuffer(slices.tobytes(), dtype=np.uint8).reshape(len(slices), 21)
+    digits = raw.astype(np.int64) - ord('0')
+
+    valid = np.all((digits[:, M4_TIMESTAMP_DIGITS] >= 0) & (digits[:, M4_TIMESTAMP_DIGITS] <= 9), axis=1)
+    for position, separator in M4_TIMESTAMP_SEPARATORS.items():
+        valid &= raw[:, position] == ord(separator)
+
+    rows = np.arange(len(slices))
+    def two_digits(positions):
+        return digits[rows, positions] * 10 + digits[rows, positions + 1]
+    year_pos, month_pos, day_pos = [np.where(bracketed, bracketed_pos, common_pos) for bracketed_pos, common_pos
+                                    in zip(M4_BRACKETED_DATE_FIELDS, M4_COMMON_DATE_FIELDS)]
+    year = two_digits(year_pos)
+    year = np.where(year < 69, 2000 + year, 1900 + year)  # same pivot as %y
+    month = two_digits(month_pos)
+    day = two_digits(day_pos)
+    hour = two_digits(np.full(len(slices), 9))
+    minute = two_digits(np.full(len(slices), 12))
+    second = two_digits(np.full(len(slices), 15))
+    millisecond = digits[:, 18] * 100 + digits[:, 19] * 10 + digits[:, 20]
+
+    valid &= (month >= 1) & (month <= 12) & (hour <= 23) & (minute <= 59) & (second <= 59)
+    month_start = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype('datetime64[M]')
+    days_in_month = ((month_start + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= (day >= 1) & (day <= days_in_month)
+
+    timestamps = (month_start.astype('datetime64[D]').astype('datetime64[us]')
+                  + (day - 1).astype('timedelta64[D]')
+                  + (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')
+                  + (millisecond * 1000).astype('timedelta64[us]'))
+    timestamps[~valid] = np.datetime64('NaT', 'us')
+    return timestamps
+
+###batch version of extract_timestamp_m4, returns a datetime64[us] array with one timestamp per line
+###lines the vectorized path can't read fall back to extract_timestamp_m4 and are NaT if that fails too
+def extract_timestamps_m4_bulk(lines):
+    lines = list(lines)
+    slices, bracketed, fixed_width = get_m4_timestamp_slices(lines)
+    timestamps = parse_m4_timestamp_slices(slices, bracketed)
+    timestamps[~fixed_width] = np.datetime64('NaT', 'us')
+    for index in np.flatnonzero(np.isnat(timestamps)):
+        try:
+            timestamps[index] = np.datetime64(extract_timestamp_m4(lines[index]), 'us')
+        except (ValueError, IndexError):
+            pass
+    return timestamps
+
 ###returns the contents of a file in one big string
 def get_file_contents_as_string_variable(file_path):
     content = ''
@@ -32,21 +120,210 @@ def get_file_contents_as_string_variable(file_path):
 
 ###finds all lines that match a certain regex pattern
 def find_matching_lines_regex(log_name, patterns):
-    lines = []
     with open(log_name) as f:
-        for line in f:
-            for pattern in patterns:
-                if re.search(pattern, line):
-                    lines.append(line)
-                    break
+        return get_matching_lines(f, patterns)
+
+###returns the lines (any iterable of lines, e.g. an open file) that match a certain regex pattern
+def get_matching_lines(lines_iterable, patterns):
+    lines = []
+    for line in lines_iterable:
+        for pattern in patterns:
+            if re.search(pattern, line):
+                lines.append(line)
+                break
     return lines
 
-###sorts a list of log lines by timestamp
+###logs at least this big are split into byte ranges that are scanned in parallel processes
+CHUNKED_SCAN_MIN_BYTES = 64 * 1024 * 1024
+CHUNK_BOUNDARY_SEARCH_BYTES = 1024 * 1024
+
+###returns the position of the first boundary at or after offset: right after a newline,
+###or right at the start of the delimiter when one is given. None if there is no boundary left
+def find_chunk_boundary(f, offset, delimiter=None):
+    separator = delimiter if delimiter is not None else b"\n"
+    f.seek(offset)
+    carried = b""
+    while True:
+        block = f.read(CHUNK_BOUNDARY_SEARCH_BYTES)
+        if not block:
+            return None
+        data = carried + block
+        found = data.find(separator)
+        if found != -1:
+            position = offset - len(carried) + found
+            return position if delimiter is not None else position + 1
+        # keep the tail in case the separator is split across two reads
+        carried = data[-(len(separator) - 1):] if len(separator) > 1 else b""
+        offset += len(block)
+
+###splits a file into at most n_chunks (start, end) byte ranges that line up with newlines (or with the delimiter)
+def get_chunk_ranges(file_path, n_chunks, delimiter=None):
+    file_size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for i in range(1, n_chunks):
+            boundary = find_chunk_boundary(f, max(file_size * i // n_chunks, boundaries[-1] + 1), delimiter)
+            if boundary is None or boundary >= file_size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+###reads a byte range of a file and decodes it the same way open(file_path) would (default encoding, universal newlines)
+def read_file_chunk(file_path, start, end):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data))
+
+###returns every log file whose name contains name_filter, in any of the directories (a single path or a list of paths)
+def find_log_files(log_paths, name_filter):
+    if isinstance(log_paths, (str, os.PathLike)):
+        log_paths = [log_paths]
+    all_logs = []
+    for log_path in log_paths:
+        for root, dirs, files in os.walk(log_path):
+            for file in files:
+                if name_filter in file:
+                    all_logs.append(os.path.join(root, file))
+    return all_logs
+
+###bytes at the start of a log that are fingerprinted to find the logs that may overlap it
+FINGERPRINT_HEAD_BYTES = 4096
+
+###returns a fingerprint of the contents of a file, or of only its first limit bytes
+def get_file_fingerprint(file_path, limit=None):
+    fingerprint = hashlib.blake2b(digest_size=16)
+    remaining = os.path.getsize(file_path) if limit is None else limit
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(CHUNK_BOUNDARY_SEARCH_BYTES, remaining))
+            if not block:
+                break
+            fingerprint.update(block)
+            remaining -= len(block)
+    return fingerprint.digest()
+
+###drops logs whose contents are identical to, or the start of, another log. e.g. the same rotated file in two
+###downloaded bundles, or yesterday's voice_engine.log that today's bundle has with more lines at the end
+###a log is only compared in full with bigger logs that start with the same FINGERPRINT_HEAD_BYTES
+def get_unique_log_files(all_logs):
+    sizes = {log: os.path.getsize(log) for log in all_logs}
+    heads = {log: get_file_fingerprint(log, min(sizes[log], FINGERPRINT_HEAD_BYTES)) for log in all_logs}
+
+    duplicate_logs = set()
+    kept_logs = []
+    # biggest first, so a log can only be contained in a log that has been kept already
+    for log in sorted(all_logs, key=lambda log: sizes[log], reverse=True):
+        if sizes[log] >= FINGERPRINT_HEAD_BYTES:
+            candidates = [kept_log for kept_log in kept_logs if heads[kept_log] == heads[log]]
+        else:
+            candidates = kept_logs
+        if candidates:
+            fingerprint = get_file_fingerprint(log)
+            if any(get_file_fingerprint(kept_log, sizes[log]) == fingerprint for kept_log in candidates):
+                duplicate_logs.add(log)
+                continue
+        kept_logs.append(log)
+
+    if duplicate_logs:
+        print(f"Skipping {len(duplicate_logs)} log files identical to or contained at the start of another log: {', '.join(sorted(duplicate_logs))}")
+    return [log for log in all_logs if log not in duplicate_logs]
+
+###a block of log lines ends after a line whose crc32 is a multiple of this, so on average every 64 lines
+###the block ends depend only on the lines themselves, so overlapping logs (yesterday's base_ext.log is the start of
+###today's base_ext.1.log) are cut into the same blocks and the shared blocks get the same fingerprint
+LINE_BLOCK_BOUNDARY_MODULUS = 64
+
+###returns the fingerprint of a block of lines
+def get_block_fingerprint(block_lines):
+    return hashlib.blake2b("".join(block_lines).encode(errors='replace'), digest_size=16).digest()
+
+###splits lines into content defined blocks, yields (fingerprint, lines of the block)
+def get_line_blocks(lines_iterable):
+    block_lines = []
+    for line in lines_iterable:
+        block_lines.append(line)
+        if zlib.crc32(line.encode(errors='replace')) % LINE_BLOCK_BOUNDARY_MODULUS == 0:
+            yield get_block_fingerprint(block_lines), block_lines
+            block_lines = []
+    if block_lines:
+        yield get_block_fingerprint(block_lines), block_lines
+
+###worker: returns (fingerprint, matching lines) for every block of lines in a byte range of a base_ext log, in file order
+###blocks whose fingerprint is in seen_blocks were already scanned in another log and are not matched again
+###without fingerprint_blocks the whole range is matched as a single block with fingerprint None
+def scan_base_ext_chunk(file_path, start, end, patterns, seen_blocks=None, fingerprint_blocks=True):
+    scanned_blocks = []
+    with read_file_chunk(file_path, start, end) as f:
+        if not fingerprint_blocks:
+            return [(None, get_matching_lines(f, patterns))]
+        for fingerprint, block_lines in get_line_blocks(f):
+            if seen_blocks is not None and fingerprint in seen_blocks:
+                scanned_blocks.append((fingerprint, []))
+            else:
+                scanned_blocks.append((fingerprint, get_matching_lines(block_lines, patterns)))
+    return scanned_blocks
+
+###worker: splits a byte range of a voice engine log by the voice session delimiter
+###the first range of a file gets the "\n" that get_all_voice_logs_as_str puts in front of every log
+###complete sessions of other headsets are dropped here, the first and last piece may continue in the next range and are always kept
+def split_voice_chunk(file_path, start, end, headsets=None):
+    with read_file_chunk(file_path, start, end) as f:
+        text = f.read()
+    if start == 0:
+        text = "\n" + text
+    pieces = text.split(VOICE_SESSION_DELIMITER)
+    if headsets is not None and len(pieces) > 2:
+        pieces = [pieces[0]] + [piece for piece in pieces[1:-1] if is_voice_session_selected(piece, headsets)] + [pieces[-1]]
+    return pieces
+
+###line that ends the part of a voice session that get_voice_session_data reads
+VOICE_SESSION_END = "Exiting voice transaction worker thread"
+
+###returns the headset ID of a voice session (as a string chunk or as a list of lines) without parsing the rest of it
+def get_voice_session_headset_id(voice_session):
+    if not isinstance(voice_session, str):
+        voice_session = "\n".join(voice_session)
+    # same rule as get_voice_session_data: the last headset ID up to and including the first "Exiting" line
+    end = voice_session.find(VOICE_SESSION_END)
+    if end != -1:
+        line_end = voice_session.find("\n", end)
+        voice_session = voice_session if line_end == -1 else voice_session[:line_end]
+    position = voice_session.rfind("Headset ID: ")
+    if position == -1:
+        return ""
+    hs_id = voice_session[position + len("Headset ID: "):].split("\n", 1)[0].split()
+    return hs_id[0].replace("'", "") if hs_id else ""
+
+###a session is kept when no headsets are selected or its headset is one of them
+def is_voice_session_selected(voice_session, headsets=None):
+    return headsets is None or get_voice_session_headset_id(voice_session) in headsets
+
+###returns the byte ranges to scan a log in: one range for small logs, one per worker for logs of CHUNKED_SCAN_MIN_BYTES and up
+def get_scan_ranges(file_path, workers, delimiter=None):
+    if workers > 1 and os.path.getsize(file_path) >= CHUNKED_SCAN_MIN_BYTES:
+        return get_chunk_ranges(file_path, workers, delimiter)
+    return [(0, os.path.getsize(file_path))]
+
+###runs func(file_path, start, end, *args) for every range, in parallel when there is more than one range
+###results come back in range order, so stitching them together gives the same output as a sequential scan
+def scan_file_ranges(executor, func, file_path, ranges, *args):
+    if len(ranges) == 1 or executor is None:
+        return [func(file_path, start, end, *args) for start, end in ranges]
+    futures = [executor.submit(func, file_path, start, end, *args) for start, end in ranges]
+    return [future.result() for future in futures]
+
+
+###sorts a list of log lines by timestamp, lines without a readable timestamp end up last
 ###NOTE: can sort out of order in the case two log lines land on the same second
 def sort_list_by_timestamp(log_name, lines):
     sorted_lines = []
     if log_name == "base_ext":
-        sorted_lines = sorted(lines, key=extract_timestamp_m4)
+        lines = list(lines)
+        order = np.argsort(extract_timestamps_m4_bulk(lines), kind='stable')
+        sorted_lines = [lines[index] for index in order]
     return sorted_lines
 
 ###removes consecutive duplicates from a list of log lines
@@ -110,12 +387,65 @@ def get_all_voice_logs_as_str(path_to_ve_logs):
 
     return all_logs_in_str
 
+###line that starts every voice session in the voice engine logs
+VOICE_SESSION_DELIMITER = "-------------------  Starting Voice Processing  -------------------------"
+
 ###parses all voice logs by delimeter, returns a list of voice sessions as string chunk
 def parse_all_voice_logs_by_voice_session(logs_as_str):
-    all_sessions = logs_as_str.split("-------------------  Starting Voice Processing  -------------------------")
+    all_sessions = logs_as_str.split(VOICE_SESSION_DELIMITER)
     all_sessions = all_sessions[1:]
     all_sessions = [session.split("\n") for session in all_sessions]
     return all_sessions
+
+###returns all voice sessions from all voice engine logs, same output as
+###parse_all_voice_logs_by_voice_session(get_all_voice_logs_as_str(path_to_ve_logs))
+###big logs are split at the voice session delimiter and scanned in parallel processes
+###path_to_ve_logs can be a list of directories, logs that are identical across them are only parsed once
+###and sessions found in more than one log (overlapping bundles) are only returned once
+def get_all_voice_sessions(path_to_ve_logs, workers=None, headsets=None):
+    workers = workers or os.cpu_count() or 1
+    all_logs = get_unique_log_files(find_log_files(path_to_ve_logs, "voice_engine"))
+
+    delimiter = VOICE_SESSION_DELIMITER.encode()
+    scan_ranges = {log: get_scan_ranges(log, workers, delimiter) for log in all_logs}
+    executor = None
+    if any(len(ranges) > 1 for ranges in scan_ranges.values()):
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    # the text after the last delimiter of one piece list continues in the first piece of the next one
+    pieces = [""]
+    try:
+        for log in all_logs:
+            for chunk_pieces in scan_file_ranges(executor, split_voice_chunk, log, scan_ranges[log], headsets):
+                pieces[-1] += chunk_pieces[0]
+                pieces.extend(chunk_pieces[1:])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    all_sessions = [session.split("\n") for session in pieces[1:] if is_voice_session_selected(session, headsets)]
+    return remove_duplicate_voice_sessions(all_sessions)
+
+###a voice session is identified by its first line (the wake word, timestamped to the millisecond) and its headset ID
+###when the same session shows up more than once the longest copy is kept, a log cut off mid session holds a shorter copy
+def remove_duplicate_voice_sessions(all_sessions):
+    unique_sessions = []
+    index_per_key = {}
+    for session in all_sessions:
+        first_line = next((line for line in session if line.strip()), "")
+        if first_line == "":
+            unique_sessions.append(session)
+            continue
+        session_key = (first_line, get_voice_session_headset_id(session))
+        if session_key not in index_per_key:
+            index_per_key[session_key] = len(unique_sessions)
+            unique_sessions.append(session)
+        elif len(session) > len(unique_sessions[index_per_key[session_key]]):
+            unique_sessions[index_per_key[session_key]] = session
+
+    if len(unique_sessions) < len(all_sessions):
+        print(f"Skipping {len(all_sessions) - len(unique_sessions)} voice sessions found in more than one log")
+    return unique_sessions
 #################################################################
 
 #############DATA PROCESSING FUNCTIONS####################
@@ -191,29 +521,59 @@ def process_most_likely_outcome(voice_session_data):
 ####PP[1-9][0-9]* disconnected = headset disconnected from rfp
 ####: 0 0 1 = headset connected to rfp
 ####VehDet0\s+\(DisabledState\)\s+processing\s+EarlyWarn\s+Mode = headset disconnected from rfp
-def get_all_base_ext_headset_connected_duration(M4_log_path):
-    all_logs = []
+BASE_EXT_ON_OFF_PATTERNS = [r"PP[1-9][0-9]* disconnected", ": 0 0 1",
+                            r"VehDet0\s+\(DisabledState\)\s+processing\s+EarlyWarn\s+Mode"]
+HEADSET_ON_PATTERN = 'Headset([0-9]+): 0 0 1'
+HEADSET_OFF_PATTERN = 'PP([0-9]+) disconnected$'
+
+###returns the on/off line patterns, narrowed down to the selected headsets so other headsets' lines are never kept
+###the VehDet0 lines carry no headset ID and never become an on/off event, so they are left out when filtering
+def get_headset_on_off_patterns(headsets=None):
+    if headsets is None:
+        return BASE_EXT_ON_OFF_PATTERNS
+    hs_ids = "|".join(re.escape(hs_id) for hs_id in headsets)
+    return [rf"PP(?:{hs_ids}) disconnected", rf"Headset(?:{hs_ids}): 0 0 1"]
+
+###big logs are split into line aligned byte ranges and scanned by several processes (see CHUNKED_SCAN_MIN_BYTES)
+###all_data (the full text of every log) is only read when keep_contents is set, notify_on_matches is its only user
+def get_all_base_ext_headset_connected_duration(M4_log_path, workers=None, headsets=None, keep_contents=False):
+    workers = workers or os.cpu_count() or 1
+    patterns = get_headset_on_off_patterns(headsets)
     all_data = []
-    all_on_off = set()
-
-    # Print the directory being searched
-    # print(f"Searching in directory: {M4_log_path}")
-
-    # Walk through the directory tree
-    for root, dirs, files in os.walk(M4_log_path):
-        # print(f"Current directory: {root}")
-        # print(f"Files: {files}")
-        for file in files:
-            # print(f"Checking file: {file}")
-            if "base_ext" in file:
-                # print(f"Found matching file: {file}")
-                all_logs.append(os.path.join(root, file))
-
-    for log in all_logs:
-        on_off = find_matching_lines_regex(log, [r"PP[1-9][0-9]* disconnected", ": 0 0 1",
-                                                 "VehDet0\s+\(DisabledState\)\s+processing\s+EarlyWarn\s+Mode"])
-        all_on_off.update(on_off)
-        all_data.append(get_file_contents_as_string_variable(log))
+    # dict instead of a set to drop duplicate lines, it keeps the first seen order so lines with equal timestamps sort the same every run
+    all_on_off = {}
+    # fingerprints of the blocks of lines that have been scanned already, in any log
+    seen_blocks = set()
+
+    # Walk through the directory tree(s), identical logs from overlapping bundles are only read once
+    all_logs = get_unique_log_files(find_log_files(M4_log_path, "base_ext"))
+
+    # the logs of one directory are a single rotation set and never overlap, fingerprinting every line only pays
+    # off when logs of more than one directory (bundle) can share lines
+    fingerprint_blocks = len({os.path.dirname(log) for log in all_logs}) > 1
+
+    scan_ranges = {log: get_scan_ranges(log, workers) for log in all_logs}
+    executor = None
+    if any(len(ranges) > 1 for ranges in scan_ranges.values()):
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        for log in all_logs:
+            # ranges scanned in another process can't see seen_blocks, their duplicate blocks are dropped here instead
+            block_filter = seen_blocks if len(scan_ranges[log]) == 1 else None
+            for scanned_blocks in scan_file_ranges(executor, scan_base_ext_chunk, log, scan_ranges[log], patterns,
+                                                   block_filter, fingerprint_blocks):
+                for fingerprint, on_off in scanned_blocks:
+                    if fingerprint is not None:
+                        if fingerprint in seen_blocks:
+                            continue
+                        seen_blocks.add(fingerprint)
+                    all_on_off.update(dict.fromkeys(on_off))
+            if keep_contents:
+                all_data.append(get_file_contents_as_string_variable(log))
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     all_on_off = sort_list_by_timestamp("base_ext", all_on_off)
 
@@ -225,50 +585,61 @@ def get_all_base_ext_headset_connected_duration(M4_log_path):
 
     return all_on_off, all_data
 
-###converts the log lines into a list of dicts with headset ID, state, and time
-def process_data_set_for_duration(headset_on_off_raw_list, all_data, start_date, end_date):
-    # Initialize dictionary with headset IDs as key, nested key is date, and duration as value, starting at 0
-    headset_dict = {}
-    on_pattern = 'Headset([0-9]+): 0 0 1'
-    off_pattern = 'PP([0-9]+) disconnected$'
+###headset pairing runs in parallel processes once there are at least this many on/off events in the date range
+PARALLEL_PAIRING_MIN_EVENTS = 100000
+
+###splits the on/off lines within the date range into a chronological list of (type, timestamp, line) events per headset
+def partition_on_off_events_by_headset(headset_on_off_raw_list, start_date, end_date, headsets=None):
+    events_per_headset = {}
+
+    # Parse every timestamp at once and keep only the lines within the specified date range
+    timestamps = extract_timestamps_m4_bulk(headset_on_off_raw_list)
+    in_range = np.flatnonzero((timestamps >= np.datetime64(start_date, 'us')) & (timestamps <= np.datetime64(end_date, 'us')))
+
+    for index, this_timestamp in zip(in_range, timestamps[in_range].tolist()):
+        line = headset_on_off_raw_list[index]
+        for event_type, pattern in [("on", HEADSET_ON_PATTERN), ("off", HEADSET_OFF_PATTERN)]:
+            match = re.findall(pattern, line)
+            if match and (headsets is None or match[0] in headsets):
+                events_per_headset.setdefault(match[0], []).append((event_type, this_timestamp, line))
+
+    return events_per_headset
+
+###worker: turns the events of one headset into its dict of on, off and events
+###off events before the first on are dropped and repeated timestamps are only kept once
+def process_headset_events(hs_id, events):
+    headset_data = {"on": [], "off": [], "events": []}
+    seen_timestamps = {"on": set(), "off": set()}
+    for event_type, this_timestamp, line in events:
+        if event_type == "off" and not headset_data["on"]:  # Only add off time once the headset has been on
+            continue
+        if this_timestamp not in seen_timestamps[event_type]:
+            seen_timestamps[event_type].add(this_timestamp)
+            headset_data[event_type].append({"timestamp": this_timestamp, "line": line})
+            headset_data["events"].append({"type": event_type, "timestamp": this_timestamp, "line": line})
+
+    # Remove back-to-back 'on' and 'off' entries with the younger timestamp
+    return remove_back_to_back_entries({hs_id: headset_data})[hs_id]
 
+###converts the log lines into a list of dicts with headset ID, state, and time
+###events are partitioned by headset first so each headset is paired on its own, in parallel for big data sets
+def process_data_set_for_duration(headset_on_off_raw_list, all_data, start_date, end_date, headsets=None, workers=None):
     # # Convert start_date and end_date to datetime objects
     # start_date = datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S")
     # end_date = datetime.strptime(end_date, "%Y-%m-%d %H:%M:%S")
 
-    # Loop through each line in logs
-    for index, line in enumerate(headset_on_off_raw_list):
-        this_timestamp = extract_timestamp_m4(line)
-
-        # Check if the timestamp is within the specified date range
-        if start_date <= this_timestamp <= end_date:
-            on_match = re.findall(on_pattern, line)
-            if on_match:
-                hs_id = on_match[0]
-                if hs_id not in headset_dict:
-                    headset_dict[hs_id] = {"on": [], "off": [], "events": []}
-                if not any(entry['timestamp'] == this_timestamp for entry in headset_dict[hs_id]["on"]):
-                    headset_dict[hs_id]["on"].append({"timestamp": this_timestamp, "line": line})
-                    headset_dict[hs_id]["events"].append({"type": "on", "timestamp": this_timestamp, "line": line})
-
-            off_match = re.findall(off_pattern, line)
-            if off_match:
-                hs_id = off_match[0]
-                if hs_id in headset_dict:  # Only add off time if hs_id exists
-                    if not any(entry['timestamp'] == this_timestamp for entry in headset_dict[hs_id]["off"]):
-                        headset_dict[hs_id]["off"].append({"timestamp": this_timestamp, "line": line})
-                        headset_dict[hs_id]["events"].append({"type": "off", "timestamp": this_timestamp, "line": line})
-
-    # print(f'\nBefore removing duplicates:'); notify_on_matches(headset_dict, all_data)
-
-    # Remove back-to-back 'on' and 'off' entries with the younger timestamp
-    headset_dict = remove_back_to_back_entries(headset_dict)
+    events_per_headset = partition_on_off_events_by_headset(headset_on_off_raw_list, start_date, end_date, headsets)
+    # Only headsets that have been on are kept, same as only creating the entry on an on match
+    hs_ids = [hs_id for hs_id, events in events_per_headset.items() if any(event[0] == "on" for event in events)]
 
-    # Update ordered_events after removing duplicates
-    ordered_events = []
-    for hs_id in headset_dict:
-        ordered_events.extend(headset_dict[hs_id]["events"])
-    ordered_events.sort(key=lambda x: x["timestamp"])
+    workers = workers or os.cpu_count() or 1
+    total_events = sum(len(events_per_headset[hs_id]) for hs_id in hs_ids)
+    if workers > 1 and len(hs_ids) > 1 and total_events >= PARALLEL_PAIRING_MIN_EVENTS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            processed = list(executor.map(process_headset_events, hs_ids, [events_per_headset[hs_id] for hs_id in hs_ids]))
+    else:
+        processed = [process_headset_events(hs_id, events_per_headset[hs_id]) for hs_id in hs_ids]
+    headset_dict = dict(zip(hs_ids, processed))
 
     # print('\nAfter removing duplicates:'); notify_on_matches(headset_dict, all_data)
 
@@ -410,6 +781,18 @@ def get_voice_session_data(voice_session_list: list):
         return voice_session_data
 
 
+###returns the Most Likely Outcome categories that count as a false awakening
+###selection 1 = less strict search criteria, selection 2 = more strict search criteria
+def get_criteria(selection):
+    if selection == 1:
+        return ["Timeout", "Other"]
+    else:
+        return ["Reject", "Timeout", "Other", "Reject-User Not Notified", "Timeout-User Not Notified"]
+
+###sort key for headset IDs: numeric IDs in numeric order, anything the logs mangled (e.g. "12,") after them
+def get_headset_sort_key(hs_id):
+    return (0, int(hs_id), "") if hs_id.isdigit() else (1, 0, hs_id)
+
 ###extracts and sums false awakenings from voice data
 def extract_false_awakenings(voice_data, criteria):
     # Sort the voice data by 'Headset ID'
@@ -418,9 +801,9 @@ def extract_false_awakenings(voice_data, criteria):
     # Initialize the dictionary to store false awakenings count
     false_awakenings_data = {data['Headset ID']: 0 for data in sorted_voice_data if data['Headset ID'] != ""}
 
-    # Count false awakenings
+    # Count false awakenings, sessions tagged by correlate_voice_sessions_with_uptimes as outside of uptime are orphans and not counted
     for data in sorted_voice_data:
-        if data['Headset ID'] != "":
+        if data['Headset ID'] != "" and data.get("In Uptime", True):
             if data['Most Likely Outcome'] in criteria:
                 false_awakenings_data[data['Headset ID']] += 1
 
@@ -429,40 +812,148 @@ def extract_false_awakenings(voice_data, criteria):
 
     return sorted_false_awakenings
 
-def get_uptimes_per_headset(durations, days):
-    headset_uptimes = {}
-
+###pairs each headset's on and off times into arrays of uptime interval starts and ends (datetime64[us])
+def get_uptime_interval_arrays(durations):
+    interval_arrays = {}
     for hs_id, times in durations.items():
-        on_times = [entry["timestamp"] for entry in times["on"]]
-        off_times = [entry["timestamp"] for entry in times["off"]]
-        durations_list = []
-        zipped = zip(on_times, off_times)
-        for on_time, off_time in zipped:
-            if off_time > on_time:  # Only subtract if off time is greater than on time
-                duration = off_time - on_time
-                durations_list.append((on_time, duration))
-        headset_uptimes[hs_id] = durations_list
-
-    # Calculate total uptime per headset within each date range
-    total_uptime_per_period = {}
-    original_total_uptime = {}
-
-    for hs_id, durations_list in headset_uptimes.items():
-        period_uptimes = {}
-        total_duration = timedelta()
-        for on_time, duration in durations_list:
-            period_start = on_time - timedelta(days=on_time.day % days)
-            period_end = period_start + timedelta(days=days)
-            period_key = f"{period_start.date()} to {period_end.date()}"
-            if period_key not in period_uptimes:
-                period_uptimes[period_key] = timedelta()
-            period_uptimes[period_key] += duration
-            total_duration += duration
-
-        total_uptime_per_period[hs_id] = {k: v.total_seconds() for k, v in period_uptimes.items()}
-        original_total_uptime[hs_id] = total_duration.total_seconds()
-
-    return total_uptime_per_period, original_total_uptime
+        pairs = min(len(times["on"]), len(times["off"]))
+        on_times = np.array([entry["timestamp"] for entry in times["on"][:pairs]], dtype='datetime64[us]')
+        off_times = np.array([entry["timestamp"] for entry in times["off"][:pairs]], dtype='datetime64[us]')
+        valid = off_times > on_times  # Only subtract if off time is greater than on time
+        interval_arrays[hs_id] = (on_times[valid], off_times[valid])
+    return interval_arrays
+
+###pairs each headset's on and off times into (on, off) uptime intervals
+def get_uptime_intervals(durations):
+    return {hs_id: list(zip(on_times.tolist(), off_times.tolist()))
+            for hs_id, (on_times, off_times) in get_uptime_interval_arrays(durations).items()}
+
+###returns the total uptime per headset in seconds
+def get_uptimes_per_headset(durations):
+    return {hs_id: float((off_times - on_times).sum() / np.timedelta64(1, 's'))
+            for hs_id, (on_times, off_times) in get_uptime_interval_arrays(durations).items()}
+
+###tags every voice session with "In Uptime" (its headset was connected when the session started) and
+###"Time Since Connect" (seconds between the headset connecting and the session starting, None for orphaned sessions)
+###each headset's sessions and uptime intervals are walked together in time order, so no nested scan is needed
+def correlate_voice_sessions_with_uptimes(voice_data, durations):
+    uptime_intervals = get_uptime_intervals(durations)
+
+    sessions_per_headset = {}
+    for data in voice_data:
+        data["In Uptime"] = False
+        data["Time Since Connect"] = None
+        if data['Headset ID'] != "":
+            session_start = datetime.strptime(data['Session Start'], "%m/%d/%y %H:%M:%S")
+            sessions_per_headset.setdefault(data['Headset ID'], []).append((session_start, data))
+
+    for hs_id, sessions in sessions_per_headset.items():
+        intervals = sorted(uptime_intervals.get(hs_id, []))
+        sessions.sort(key=lambda session: session[0])
+        i = 0
+        for session_start, data in sessions:
+            # skip the intervals that ended before this session, later sessions can't fall in them either
+            while i < len(intervals) and intervals[i][1] < session_start:
+                i += 1
+            if i < len(intervals) and intervals[i][0] <= session_start:
+                data["In Uptime"] = True
+                data["Time Since Connect"] = (session_start - intervals[i][0]).total_seconds()
+
+    return voice_data
+
+###calendar granularities that aggregate_uptimes_and_false_triggers always produces
+###a custom interval of N days is added on top of these as "N days"
+AGGREGATION_GRANULARITIES = ["hour", "day", "week", "month"]
+
+###returns the aggregation key for the time interval entered at the prompt (a granularity name or a number of days)
+def get_granularity_key(time_interval):
+    if time_interval in AGGREGATION_GRANULARITIES:
+        return time_interval
+    return f"{int(time_interval)} days"
+
+###returns the x axis label for the time interval entered at the prompt
+def get_interval_label(time_interval):
+    if time_interval in AGGREGATION_GRANULARITIES:
+        return f'Interval of 1 {time_interval}'
+    return f'Interval of {time_interval} days'
+
+###returns the start of the calendar period the timestamp falls in
+###custom N day periods are counted from the midnight of the anchor (the start date of the analysis)
+def get_period_start(timestamp, granularity, anchor):
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day_start = datetime.combine(timestamp.date(), datetime.min.time())
+    if granularity == "day":
+        return day_start
+    if granularity == "week":
+        return day_start - timedelta(days=day_start.weekday())
+    if granularity == "month":
+        return day_start.replace(day=1)
+    days = int(granularity.split()[0])
+    anchor_start = datetime.combine(anchor.date(), datetime.min.time())
+    return anchor_start + timedelta(days=days * ((day_start - anchor_start).days // days))
+
+###returns the start of the period that follows the one starting at period_start
+def get_next_period_start(period_start, granularity):
+    if granularity == "hour":
+        return period_start + timedelta(hours=1)
+    if granularity == "day":
+        return period_start + timedelta(days=1)
+    if granularity == "week":
+        return period_start + timedelta(days=7)
+    if granularity == "month":
+        if period_start.month == 12:
+            return period_start.replace(year=period_start.year + 1, month=1)
+        return period_start.replace(month=period_start.month + 1)
+    return period_start + timedelta(days=int(granularity.split()[0]))
+
+###aggregates uptime (hours) and false trigger counts per headset for every granularity in a single pass
+###over the uptime intervals and voice sessions, uptime intervals that cross a period boundary are split between periods
+###returns {granularity: {(period start, period end): {headset ID: {'uptime': hours, 'false_triggers': count}}}}
+def aggregate_uptimes_and_false_triggers(durations, voice_data, criteria, headsets, start_date, custom_days=None,
+                                         granularities=AGGREGATION_GRANULARITIES):
+    granularities = list(granularities)
+    if custom_days is not None and get_granularity_key(custom_days) not in granularities:
+        granularities.append(get_granularity_key(custom_days))
+    periods = {granularity: {} for granularity in granularities}
+
+    def get_slot(granularity, period_start, hs_id):
+        period_key = (period_start, get_next_period_start(period_start, granularity) - timedelta(seconds=1))
+        slot = periods[granularity].setdefault(period_key, {})
+        if hs_id not in slot:
+            slot[hs_id] = {'uptime': 0, 'false_triggers': 0}
+        return slot[hs_id]
+
+    for hs_id, intervals in get_uptime_intervals(durations).items():
+        if hs_id not in headsets:
+            continue
+        for on_time, off_time in intervals:
+            for granularity in granularities:
+                period_start = get_period_start(on_time, granularity, start_date)
+                while period_start < off_time:
+                    next_period_start = get_next_period_start(period_start, granularity)
+                    overlap = min(off_time, next_period_start) - max(on_time, period_start)
+                    get_slot(granularity, period_start, hs_id)['uptime'] += overlap.total_seconds() / 3600
+                    period_start = next_period_start
+
+    for data in voice_data:
+        hs_id = data['Headset ID']
+        if hs_id == "" or hs_id not in headsets or data['Most Likely Outcome'] not in criteria:
+            continue
+        # only awakenings that happened during measured uptime count towards the rates
+        if not data.get("In Uptime", True):
+            continue
+        session_start = datetime.strptime(data['Session Start'], "%m/%d/%y %H:%M:%S")
+        for granularity in granularities:
+            get_slot(granularity, get_period_start(session_start, granularity, start_date), hs_id)['false_triggers'] += 1
+
+    return {granularity: dict(sorted(slots.items())) for granularity, slots in periods.items()}
+
+###formats a period boundary, hourly periods also show the time so every boundary of a granularity looks the same
+def format_period_boundary(timestamp, time_interval=None):
+    if time_interval is not None and get_granularity_key(time_interval) == "hour":
+        return timestamp.strftime('%Y-%m-%d %H:%M')
+    return timestamp.strftime('%Y-%m-%d')
 
 #################################################################
 
@@ -470,13 +961,14 @@ def get_uptimes_per_headset(durations, days):
 
 ###gets all headset data
 ###return all iterations of the data. From raw log lines ->  processed durations -> total uptimes
-def get_hs_durations(m4_log_path, start_date, end_date, time_interval):
+###only lines of the selected headsets are kept, all headsets when headsets is None
+def get_hs_durations(m4_log_path, start_date, end_date, headsets=None):
     print("Getting Headset Log Lines as a list...")
-    headset_on_off_raw_list, all_data = get_all_base_ext_headset_connected_duration(m4_log_path)
+    headset_on_off_raw_list, all_data = get_all_base_ext_headset_connected_duration(m4_log_path, headsets=headsets)
     print("Reformatting log lines to dictionaries...")
-    durations_dict = process_data_set_for_duration(headset_on_off_raw_list, all_data, start_date, end_date)
+    durations_dict = process_data_set_for_duration(headset_on_off_raw_list, all_data, start_date, end_date, headsets)
     print("Calculating Uptimes per headset ID...")
-    uptimes_per_interval, total_uptimes = get_uptimes_per_headset(durations_dict, time_interval)
+    total_uptimes = get_uptimes_per_headset(durations_dict)
     print("Headset Uptimes(Seconds): ")
     print(total_uptimes)
 
@@ -488,107 +980,62 @@ def get_hs_durations(m4_log_path, start_date, end_date, time_interval):
     total_uptime_hours = sum(total_uptimes_in_hours.values())
     print(f"Total uptime in hours: {total_uptime_hours}")
 
-    # Convert seconds to hours for each interval
-    uptimes_hours_per_interval = {
-        outer_key: {inner_key: value / 3600 for inner_key, value in inner_dict.items()}
-        for outer_key, inner_dict in uptimes_per_interval.items()
-    }
-    # uptimes_hours_per_interval = {key: value / 3600 for key, value in uptimes_per_interval.items()}
-
+    return headset_on_off_raw_list, durations_dict, total_uptime_hours
 
-    return headset_on_off_raw_list, durations_dict, total_uptime_hours, uptimes_hours_per_interval
+###gets all voice data between start and end date and aggregates it with the headset uptimes
+###returns the uptimes and false triggers of the selected headsets for every granularity (see aggregate_uptimes_and_false_triggers)
+def get_false_awakening_data_bound(path_to_ve_logs, start_date, end_date, selection, headsets, durations_dict, days=None):
+    criteria = get_criteria(selection)
 
-def get_false_awakening_data_bound(path_to_ve_logs, start_date, end_date, selection, headsets, uptimes_hours_per_interval, days):
-    if selection == 1:
-        criteria = ["Timeout", "Other"]
-    else:
-        criteria = ["Reject", "Timeout", "Other", "Reject-User Not Notified", "Timeout-User Not Notified"]
-
-    print("Getting Voice Engine Logs as a single string...")
-    # Put voice engine log into a single string
-    all_logs_in_str = get_all_voice_logs_as_str(path_to_ve_logs)
+    print("Parsing Voice Engine Logs as list of voice sessions...")
+    # Parse voice engine logs, big logs are split up and parsed in parallel and only the selected headsets' sessions are kept
+    all_voice_sessions = get_all_voice_sessions(path_to_ve_logs, headsets=headsets)
 
-    print("Parsing String as list of voice sessions...")
-    # Parse voice engine logs
-    all_voice_sessions = parse_all_voice_logs_by_voice_session(all_logs_in_str)
-
-    print("Processing Voice Data...")
-    uptime_hours_in_time_slot = {}
+    print(f"Processing Voice Data from {start_date} to {end_date}...")
     all_voice_data = []
 
-    # Filter uptimes to include only selected headsets
-    filtered_uptimes = {key: value for key, value in uptimes_hours_per_interval.items() if key in headsets}
-
-    # Initialize the current start date for the first interval
-    current_start_date = start_date
-
-    days = int(days) - 1
-    while current_start_date <= end_date:
-        # Calculate the end date for the current interval
-        current_end_date = current_start_date + timedelta(days=days, hours=23, minutes=59, seconds=59)
+    for session in all_voice_sessions:
+        # Extract the session date from the session data
+        session_date_str = session[1][1:18]  # Assuming the date is in the format 'MM/DD/YY HH:MM:SS' at the start of the session
+        session_date = datetime.strptime(session_date_str, "%m/%d/%y %H:%M:%S")
 
-        # Ensure the current end date does not exceed the overall end date
-        if current_end_date > end_date:
-            current_end_date = end_date
+        # Check if the session date is within the date range
+        if start_date <= session_date <= end_date:
+            this_session_data = get_voice_session_data(session)
 
-        print(f"Processing data from {current_start_date} to {current_end_date}...")
+            if this_session_data is not None:
+                all_voice_data.append(this_session_data)
 
-        voice_data = []
+    print("Correlating Voice Sessions with Headset Uptimes...")
+    correlate_voice_sessions_with_uptimes(all_voice_data, durations_dict)
+    orphaned_sessions = sum(1 for data in all_voice_data if data['Headset ID'] != "" and not data["In Uptime"])
+    print(f"{orphaned_sessions} of {len(all_voice_data)} voice sessions happened while their headset was not connected and are left out of the rates")
 
-        for session in all_voice_sessions:
-            # Extract the session date from the session data
-            session_date_str = session[1][1:18]  # Assuming the date is in the format 'MM/DD/YY HH:MM:SS' at the start of the session
-            session_date = datetime.strptime(session_date_str, "%m/%d/%y %H:%M:%S")
+    print("Extracting False Awakenings...")
+    false_awakening_data = extract_false_awakenings(all_voice_data, criteria)
 
-            # Check if the session date is within the current interval range
-            if current_start_date <= session_date <= current_end_date:
-                this_session_data = get_voice_session_data(session)
+    print("False Awakenings: ")
+    for key, value in false_awakening_data.items():
+        if key in headsets:  # Only process headsets in the specified list
+            print(f'Headset ID: {key}, False Awakenings: {str(value)}')
 
-                if this_session_data is not None:
-                    voice_data.append(this_session_data)
-                    all_voice_data.append(this_session_data)
+    print("Aggregating uptimes and false awakenings per interval...")
+    uptimes_and_false_triggers = aggregate_uptimes_and_false_triggers(durations_dict, all_voice_data, criteria, headsets,
+                                                                      start_date, days)
 
-        print("Extracting False Awakenings...")
-        false_awakening_data = extract_false_awakenings(voice_data, criteria)
+    # Print the aggregated data of the requested interval
+    if days:
+        for period, data in uptimes_and_false_triggers[get_granularity_key(days)].items():
+            print(f"Interval {format_period_boundary(period[0], days)} to {format_period_boundary(period[1], days)}: {data}")
 
-        print("False Awakenings: ")
-        for key, value in false_awakening_data.items():
-            if key in headsets:  # Only process headsets in the specified list
-                print(f'Headset ID: {key}, False Awakenings: {str(value)}')
+    return all_voice_sessions, all_voice_data, false_awakening_data, uptimes_and_false_triggers
 
-                # Update the uptimes dictionary with false awakening data
-                if (current_start_date.date(), current_end_date.date()) not in uptime_hours_in_time_slot:
-                    uptime_hours_in_time_slot[(current_start_date.date(), current_end_date.date())] = {}
-
-                if key in filtered_uptimes:
-                    # Iterate through each interval and retrieve the uptime value
-                    for interval_key, uptime_value in filtered_uptimes[key].items():
-                        # Convert interval_key to datetime format for comparison
-                        interval_start_str, interval_end_str = interval_key.split(" to ")
-                        interval_start_date = datetime.strptime(interval_start_str, "%Y-%m-%d").date()
-                        interval_end_date = datetime.strptime(interval_end_str, "%Y-%m-%d").date()
-
-                        if (interval_start_date, interval_end_date) == (current_start_date.date(), current_end_date.date()):
-                            uptime_hours_in_time_slot[(current_start_date.date(), current_end_date.date())][key] = {
-                                'uptime': uptime_value,
-                                'false_triggers': value
-                            }
-
-        # Move to the next interval
-        current_start_date = current_end_date + timedelta(seconds=1)
-
-    # Print the updated weekly uptimes dictionary
-    for week, data in uptime_hours_in_time_slot.items():
-        print(f"Week {week}: {data}")
-
-    return all_logs_in_str, all_voice_sessions, all_voice_data, false_awakening_data, uptime_hours_in_time_slot
-
-def get_individual_rates(uptimes_in_time_slot):
+def get_individual_rates(uptimes_in_time_slot, time_interval=None):
     rates = {}
 
     # Iterate over each week in the weekly_uptimes dictionary
-    for time_interval, data in uptimes_in_time_slot.items():
-        start_date, end_date = time_interval
+    for period, data in uptimes_in_time_slot.items():
+        start_date, end_date = period
 
         # Calculate the false trigger rates for each headset
         for headset_id, value in data.items():
@@ -609,9 +1056,9 @@ def get_individual_rates(uptimes_in_time_slot):
             time_interval_start, time_interval_end = entry['time interval']
             rate = entry['rate']
             if rate is not None:
-                print(f"  Time interval from {time_interval_start.strftime('%Y-%m-%d')} to {time_interval_end.strftime('%Y-%m-%d')}: {rate:.2f}%")
+                print(f"  Time interval from {format_period_boundary(time_interval_start, time_interval)} to {format_period_boundary(time_interval_end, time_interval)}: {rate:.2f}%")
             else:
-                print(f"  Time interval from {time_interval_start.strftime('%Y-%m-%d')} to {time_interval_end.strftime('%Y-%m-%d')}: N/A (Uptime is 0)")
+                print(f"  Time interval from {format_period_boundary(time_interval_start, time_interval)} to {format_period_boundary(time_interval_end, time_interval)}: N/A (Uptime is 0)")
 
     return rates
 
@@ -640,19 +1087,30 @@ def get_overall_rates_over_time(uptimes_in_time_interval):
 
     return rates_over_interval
 
-def plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interval):
+###returns the total uptime of all headsets per interval
+def get_total_uptime_per_period(uptimes_and_false_triggers):
+    return {period: sum(value['uptime'] for value in data.values() if 'uptime' in value)
+            for period, data in uptimes_and_false_triggers.items()}
+
+###shows the plot, or saves it to output_path when one is given
+###with block=False the window is shown without waiting on it (used by the analysis session)
+def plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interval, output_path=None, block=True):
     # Determine the common x-axis and y-axis limits
     all_time_intervals = []
     all_rates = []
 
     for data in rates.values():
-        all_time_intervals.extend([f"{entry['time interval'][0].strftime('%Y-%m-%d')} to {entry['time interval'][1].strftime('%Y-%m-%d')}" for entry in data])
+        all_time_intervals.extend([entry['time interval'] for entry in data])
         all_rates.extend([entry['rate'] for entry in data if entry['rate'] is not None])
 
-    # Get unique weeks and sort them
+    # Get unique weeks and sort them, as (start, end) tuples so they sort chronologically
     unique_weeks = sorted(set(all_time_intervals))
+    week_index = {week: position for position, week in enumerate(unique_weeks)}
 
 
+    # Total uptime of each interval, summed once instead of once per headset
+    total_uptime_per_period = get_total_uptime_per_period(uptimes_and_false_triggers)
+
     # Create subplots for each headset
     num_headsets = len(rates)
     fig, axs = plt.subplots(num_headsets, 1, figsize=(8, 5 * num_headsets), sharex=True)
@@ -662,15 +1120,11 @@ def plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interva
 
     # Iterate over each headset in the rates dictionary
     for i, (headset_id, data) in enumerate(rates.items()):
-        time_intervals = [f"{entry['time interval'][0].strftime('%Y-%m-%d')} to {entry['time interval'][1].strftime('%Y-%m-%d')}" for entry in data]
+        time_intervals = [week_index[entry['time interval']] for entry in data]
         rates_values = [entry['rate'] for entry in data]
 
         # Extract total uptime for each week
-        total_uptimes = []
-        for entry in data:
-            time_interval = entry['time interval']
-            total_uptime = sum(value['uptime'] for value in uptimes_and_false_triggers[time_interval].values() if 'uptime' in value)
-            total_uptimes.append(total_uptime)
+        total_uptimes = [total_uptime_per_period[entry['time interval']] for entry in data]
 
         # Plotting the false trigger rates
         ax1 = axs[i]
@@ -703,18 +1157,28 @@ def plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interva
     # plt.xlabel(f'Interval of {time_interval} days')
 
     # Set the x-axis ticks with only the date portion
-    unique_weeks = [unique_weeks.split(' ')[0] for unique_weeks in unique_weeks]
+    unique_weeks = [format_period_boundary(week[0], time_interval) for week in unique_weeks]
     plt.xticks(range(len(unique_weeks)), unique_weeks, rotation=45)
-    plt.xlabel(f'Interval of {time_interval} days')
+    plt.xlabel(get_interval_label(time_interval))
 
     # Adjust layout to prevent overlap
     plt.tight_layout()
+    if output_path is not None:
+        fig.savefig(output_path)
+        plt.close(fig)
+        return
+    if not block:
+        plt.show(block=False)
+        plt.pause(0.1)
+        return
     plt.show()
     plt.pause(100)
 
-def plot_overall_rates(rates, uptimes_and_false_triggers, time_interval):
+###shows the plot, or saves it to output_path when one is given
+###with block=False the window is shown without waiting on it (used by the analysis session)
+def plot_overall_rates(rates, uptimes_and_false_triggers, time_interval, output_path=None, block=True):
     # Extract weeks and rates from the dictionary
-    interval = [f"{interval[0]} to {interval[1]}" for interval in rates.keys()]
+    interval = [f"{format_period_boundary(interval[0], time_interval)} to {format_period_boundary(interval[1], time_interval)}" for interval in rates.keys()]
     overall_rates = list(rates.values())
 
     # Extract total uptime for each week
@@ -728,7 +1192,7 @@ def plot_overall_rates(rates, uptimes_and_false_triggers, time_interval):
 
     # Plot the overall rates
     ax1.plot(interval, overall_rates, label='Overall Rate', marker='o', color='b')
-    ax1.set_xlabel(f'Interval of {time_interval} days')
+    ax1.set_xlabel(get_interval_label(time_interval))
     ax1.set_ylabel('False Triggers per Hours of Uptime', color='b')
     ax1.tick_params(axis='y', labelcolor='b')
 
@@ -750,7 +1214,7 @@ def plot_overall_rates(rates, uptimes_and_false_triggers, time_interval):
     plt.grid(True)
 
     # Set the x-axis ticks with only the date portion
-    tick_intervals = [interval.split(' ')[0] for interval in interval]
+    tick_intervals = [interval.split(' to ')[0] for interval in interval]
     plt.xticks(range(len(tick_intervals)), tick_intervals, rotation=45)
 
     # Add legends
@@ -759,9 +1223,647 @@ def plot_overall_rates(rates, uptimes_and_false_triggers, time_interval):
 
     # Adjust layout to prevent overlap
     plt.tight_layout()
+    if output_path is not None:
+        fig.savefig(output_path)
+        plt.close(fig)
+        return
+    if not block:
+        plt.show(block=False)
+        plt.pause(0.1)
+        return
     plt.show()
     plt.pause(100)
 
+###with more headsets than this the individual rates are drawn as paged small multiples and a heatmap
+INDIVIDUAL_PLOT_MAX_HEADSETS = 8
+###headsets per page of small multiples, every page has the same size no matter how many headsets there are
+OVERVIEW_GRID_ROWS = 4
+OVERVIEW_GRID_COLUMNS = 5
+
+###turns the rates into arrays once for all overview plots
+###returns the sorted intervals, the headset IDs, a headset x interval matrix of rates (NaN where there is no rate)
+###and a headset x interval matrix of each headset's own uptime
+def get_rate_matrix(rates, uptimes_and_false_triggers):
+    periods = sorted(uptimes_and_false_triggers)
+    period_index = {period: column for column, period in enumerate(periods)}
+    headset_ids = sorted(rates, key=get_headset_sort_key)
+    headset_index = {headset_id: row for row, headset_id in enumerate(headset_ids)}
+
+    rate_matrix = np.full((len(headset_ids), len(periods)), np.nan)
+    uptime_matrix = np.zeros((len(headset_ids), len(periods)))
+    for headset_id, data in rates.items():
+        for entry in data:
+            if entry['rate'] is not None:
+                rate_matrix[headset_index[headset_id], period_index[entry['time interval']]] = entry['rate']
+    for period, data in uptimes_and_false_triggers.items():
+        for headset_id, value in data.items():
+            if headset_id in headset_index:
+                uptime_matrix[headset_index[headset_id], period_index[period]] = value['uptime']
+    return periods, headset_ids, rate_matrix, uptime_matrix
+
+###a few intervals with almost no uptime get huge rates (1 trigger in 1 minute is 6000%), the overview plots stop their
+###rate scale at this percentile of the fleet's rates so the rest stays readable
+OVERVIEW_RATE_PERCENTILE = 99
+
+###returns the top of the rate scale for the overview plots, 1 when there are no rates
+def get_rate_scale_max(rate_matrix):
+    if not np.any(~np.isnan(rate_matrix)):
+        return 1
+    return np.nanpercentile(rate_matrix, OVERVIEW_RATE_PERCENTILE) or 1
+
+###returns at most max_ticks evenly spread tick positions and their labels (start of each interval)
+def get_sparse_ticks(periods, time_interval=None, max_ticks=6):
+    step = max(1, int(np.ceil(len(periods) / max_ticks)))
+    positions = list(range(0, len(periods), step))
+    return positions, [format_period_boundary(periods[position][0], time_interval) for position in positions]
+
+###draws the individual rates of any number of headsets as fixed size pages of small multiples
+###each cell shows one headset's false trigger rate (blue) and its own uptime (green, scaled so the fleet's highest uptime
+###reaches the top of the rate axis). the rate axis stops at get_rate_scale_max like the heatmap's colour scale,
+###higher rates are drawn at the top and marked red. the grid is laid out once and only the line data changes from page to page
+###returns the paths of the saved pages
+def plot_headset_small_multiples(rates, uptimes_and_false_triggers, time_interval, output_dir='GeneratedFiles',
+                                 rows=OVERVIEW_GRID_ROWS, columns=OVERVIEW_GRID_COLUMNS):
+    periods, headset_ids, rate_matrix, uptime_matrix = get_rate_matrix(rates, uptimes_and_false_triggers)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    x = np.arange(len(periods))
+    tick_positions, tick_labels = get_sparse_ticks(periods, time_interval)
+    max_rate = get_rate_scale_max(rate_matrix)
+    clipped_rate_matrix = np.minimum(rate_matrix, max_rate)
+    clipped_marker_matrix = np.where(rate_matrix > max_rate, max_rate, np.nan)
+    max_uptime = (uptime_matrix.max() if uptime_matrix.size else 0) or 1
+    scaled_uptime_matrix = uptime_matrix / max_uptime * max_rate
+
+    fig, axs = plt.subplots(rows, columns, figsize=(3.2 * columns, 2.4 * rows), squeeze=False)
+    fig.subplots_adjust(left=0.05, right=0.99, bottom=0.12, top=0.9, wspace=0.15, hspace=0.35)
+    cells = []
+    for axs_row in axs:
+        for cell_column, ax in enumerate(axs_row):
+            rate_line, = ax.plot(x, np.full(len(x), np.nan), marker='o', markersize=2, linewidth=1, color='b')
+            uptime_line, = ax.plot(x, np.full(len(x), np.nan), drawstyle='steps-mid', linewidth=1, color='g', alpha=0.5)
+            clipped_markers, = ax.plot(x, np.full(len(x), np.nan), linestyle='none', marker='^', markersize=4, color='r')
+            ax.set_xlim(-0.5, max(len(periods) - 0.5, 0.5))
+            ax.set_ylim(0, max_rate * 1.05)
+            ax.set_xticks(tick_positions)
+            ax.set_xticklabels(tick_labels, rotation=45, ha='right', fontsize=7)
+            ax.tick_params(axis='y', labelsize=7, labelleft=cell_column == 0)
+            ax.grid(True, linewidth=0.3)
+            cells.append((ax, rate_line, uptime_line, clipped_markers, ax.set_title('', fontsize=9)))
+    fig.suptitle(f'False Trigger Rate per Hours of Uptime (blue, red marks rates above {max_rate:.0f}) and Uptime '
+                 f'(green, scaled to the highest uptime of {max_uptime:.1f} hours) - {get_interval_label(time_interval)}')
+
+    page_paths = []
+    per_page = rows * columns
+    for page, first_row in enumerate(range(0, len(headset_ids), per_page), start=1):
+        headsets_on_page = min(per_page, len(headset_ids) - first_row)
+        for cell, (ax, rate_line, uptime_line, clipped_markers, title) in enumerate(cells):
+            row = first_row + cell
+            ax.set_visible(row < len(headset_ids))
+            # dates go under the bottom-most visible cell of each column, on a partial last page that is not the last grid row
+            ax.tick_params(axis='x', labelbottom=cell + columns >= headsets_on_page)
+            if row < len(headset_ids):
+                rate_line.set_ydata(clipped_rate_matrix[row])
+                clipped_markers.set_ydata(clipped_marker_matrix[row])
+                uptime_line.set_ydata(scaled_uptime_matrix[row])
+                title.set_text(f'Headset {headset_ids[row]}')
+
+        page_path = output_dir / f'headset_overview_page_{page}.png'
+        fig.savefig(page_path, dpi=100)
+        page_paths.append(page_path)
+
+    plt.close(fig)
+    return page_paths
+
+###draws the individual rates of all headsets as a single headset x interval heatmap, grey where the uptime is 0
+def plot_rate_heatmap(rates, uptimes_and_false_triggers, time_interval, output_path='GeneratedFiles/headset_rate_heatmap.png'):
+    periods, headset_ids, rate_matrix, uptime_matrix = get_rate_matrix(rates, uptimes_and_false_triggers)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    fig, ax = plt.subplots(figsize=(min(max(8, 0.25 * len(periods) + 3), 40), min(max(4, 0.12 * len(headset_ids) + 2), 40)))
+    colormap = plt.get_cmap('viridis').copy()
+    colormap.set_bad('lightgrey')
+    image = ax.imshow(np.ma.masked_invalid(rate_matrix), aspect='auto', interpolation='nearest', cmap=colormap,
+                      vmin=0, vmax=get_rate_scale_max(rate_matrix))
+    fig.colorbar(image, ax=ax, label='False Triggers per Hours of Uptime', extend='max')
+
+    tick_positions, tick_labels = get_sparse_ticks(periods, time_interval, max_ticks=20)
+    ax.set_xticks(tick_positions)
+    ax.set_xticklabels(tick_labels, rotation=45, ha='right')
+    ax.set_xlabel(get_interval_label(time_interval))
+    row_step = max(1, int(np.ceil(len(headset_ids) / 100)))
+    ax.set_yticks(range(0, len(headset_ids), row_step))
+    ax.set_yticklabels(headset_ids[::row_step], fontsize=7)
+    ax.set_ylabel('Headset ID')
+    ax.set_title('False Trigger Rate per Headset Over Time')
+    fig.tight_layout()
+
+    fig.savefig(output_path, dpi=100)
+    plt.close(fig)
+    return output_path
+
+#################################################################
+
+#############LIVE MONITORING FUNCTIONS####################
+
+###rolling windows (in hours) the live monitor keeps uptime and false trigger rates for
+LIVE_WINDOWS_HOURS = [1, 24]
+
+###tails every log in a directory tree whose file name contains name_filter
+###files are tracked by inode, so when base_ext.log is rotated to base_ext.1.log the rest of it is still read
+###under its new name and the freshly created base_ext.log is read from the beginning
+class LogDirectoryTailer:
+    def __init__(self, log_path, name_filter, from_end=True):
+        self.log_path = log_path
+        self.name_filter = name_filter
+        self.offsets = {}
+        self.partial_lines = {}
+        if from_end:
+            # only lines written after the monitor started are of interest
+            for file_path, stat in self.list_log_files():
+                self.offsets[(stat.st_dev, stat.st_ino)] = stat.st_size
+
+    ###returns (path, stat) of every matching log, oldest write first so rotated files are drained before new ones
+    def list_log_files(self):
+        log_files = []
+        for file_path in find_log_files(self.log_path, self.name_filter):
+            try:
+                log_files.append((file_path, os.stat(file_path)))
+            except FileNotFoundError:
+                # rotated away between the walk and the stat
+                continue
+        log_files.sort(key=lambda entry: entry[1].st_mtime)
+        return log_files
+
+    ###returns all complete lines written since the last call
+    def read_new_lines(self):
+        new_lines = []
+        seen_files = set()
+        for file_path, stat in self.list_log_files():
+            file_key = (stat.st_dev, stat.st_ino)
+            seen_files.add(file_key)
+            offset = self.offsets.get(file_key, 0)
+            if stat.st_size < offset:
+                # truncated in place (copytruncate rotation), start over
+                offset = 0
+                self.partial_lines.pop(file_key, None)
+            if stat.st_size == offset:
+                continue
+
+            try:
+                with open(file_path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            self.offsets[file_key] = offset + len(data)
+
+            text = self.partial_lines.pop(file_key, '') + data.decode(errors='ignore').replace('\r\n', '\n')
+            lines = text.splitlines(keepends=True)
+            # hold on to a half written last line until the rest of it shows up
+            if lines and not lines[-1].endswith('\n'):
+                self.partial_lines[file_key] = lines.pop()
+            new_lines.extend(lines)
+
+        # forget logs that were deleted by rotation
+        for file_key in list(self.offsets):
+            if file_key not in seen_files:
+                del self.offsets[file_key]
+                self.partial_lines.pop(file_key, None)
+
+        return new_lines
+
+###keeps rolling per headset uptime and false trigger counts from tailed base_ext and voice engine lines
+###on/off pairing follows process_data_set_for_duration and remove_back_to_back_entries:
+###back-to-back ons keep the oldest on, back-to-back offs keep the youngest off
+class LiveFalseAwakeningMonitor:
+    def __init__(self, criteria, headsets=None, windows_hours=LIVE_WINDOWS_HOURS):
+        self.criteria = criteria
+        self.headsets = set(headsets) if headsets else None
+        self.windows_hours = windows_hours
+        self.horizon = timedelta(hours=max(windows_hours))
+        self.connected_since = {}
+        self.uptime_intervals = {}
+        self.false_triggers = {}
+        self.voice_session_lines = None
+        self.latest_timestamp = None
+        self.latest_timestamp_read_at = None
+
+    def is_selected(self, hs_id):
+        return self.headsets is None or hs_id in self.headsets
+
+    ###log time is used as the clock so the monitor works no matter what time zone the logs are written in
+    def update_clock(self, timestamp):
+        if self.latest_timestamp is None or timestamp >= self.latest_timestamp:
+            self.latest_timestamp = timestamp
+            self.latest_timestamp_read_at = time.monotonic()
+
+    def now(self):
+        if self.latest_timestamp is None:
+            return None
+        return self.latest_timestamp + timedelta(seconds=time.monotonic() - self.latest_timestamp_read_at)
+
+    def add_base_ext_line(self, line):
+        if "but thinks it is still" in line:
+            return
+        if not any(re.search(pattern, line) for pattern in BASE_EXT_ON_OFF_PATTERNS):
+            return
+        try:
+            this_timestamp = extract_timestamp_m4(line)
+        except (ValueError, IndexError):
+            return
+        self.update_clock(this_timestamp)
+
+        on_match = re.findall(HEADSET_ON_PATTERN, line)
+        if on_match and self.is_selected(on_match[0]):
+            hs_id = on_match[0]
+            self.uptime_intervals.setdefault(hs_id, deque())
+            if hs_id not in self.connected_since:
+                self.connected_since[hs_id] = this_timestamp
+
+        off_match = re.findall(HEADSET_OFF_PATTERN, line)
+        if off_match and off_match[0] in self.uptime_intervals:
+            hs_id = off_match[0]
+            intervals = self.uptime_intervals[hs_id]
+            if hs_id in self.connected_since:
+                on_time = self.connected_since.pop(hs_id)
+                if this_timestamp > on_time:
+                    intervals.append([on_time, this_timestamp])
+            elif intervals and this_timestamp > intervals[-1][1]:
+                intervals[-1][1] = this_timestamp
+
+    ###voice lines are buffered per session and handed to get_voice_session_data once the session ends
+    def add_voice_line(self, line):
+        line = line.rstrip('\n')
+        if VOICE_SESSION_DELIMITER in line:
+            if self.voice_session_lines is not None:
+                self.voice_session_lines.append("")
+                self.finish_voice_session()
+            self.voice_session_lines = [line.split(VOICE_SESSION_DELIMITER, 1)[1]]
+            return
+        if self.voice_session_lines is None:
+            return
+        self.voice_session_lines.append(line)
+        if "Exiting voice transaction worker thread" in line:
+            self.finish_voice_session()
+
+    def finish_voice_session(self):
+        session_lines = self.voice_session_lines
+        self.voice_session_lines = None
+        this_session_data = get_voice_session_data(session_lines)
+        if this_session_data is None or this_session_data["Headset ID"] == "":
+            return
+        hs_id = this_session_data["Headset ID"]
+        if not self.is_selected(hs_id) or this_session_data["Most Likely Outcome"] not in self.criteria:
+            return
+        try:
+            session_start = datetime.strptime(this_session_data["Session Start"], "%m/%d/%y %H:%M:%S")
+        except ValueError:
+            return
+        self.update_clock(session_start)
+        if self.is_connected_at(hs_id, session_start):
+            self.false_triggers.setdefault(hs_id, deque()).append(session_start)
+
+    ###same rule as correlate_voice_sessions_with_uptimes, awakenings outside of uptime are orphans and not counted
+    def is_connected_at(self, hs_id, timestamp):
+        if hs_id in self.connected_since and self.connected_since[hs_id] <= timestamp:
+            return True
+        return any(on_time <= timestamp <= off_time for on_time, off_time in reversed(self.uptime_intervals.get(hs_id, ())))
+
+    ###drops everything that has fallen out of the longest window, and headsets that have nothing left in it
+    def prune(self, now):
+        horizon_start = now - self.horizon
+        for hs_id, intervals in list(self.uptime_intervals.items()):
+            while intervals and intervals[0][1] < horizon_start:
+                intervals.popleft()
+            if not intervals and hs_id not in self.connected_since:
+                del self.uptime_intervals[hs_id]
+        for hs_id, triggers in list(self.false_triggers.items()):
+            while triggers and triggers[0] < horizon_start:
+                triggers.popleft()
+            if not triggers:
+                del self.false_triggers[hs_id]
+
+    def get_window_counts(self, hs_id, window_start, now):
+        uptime = timedelta()
+        for on_time, off_time in self.uptime_intervals.get(hs_id, ()):
+            overlap = min(off_time, now) - max(on_time, window_start)
+            if overlap > timedelta():
+                uptime += overlap
+        if hs_id in self.connected_since:
+            overlap = now - max(self.connected_since[hs_id], window_start)
+            if overlap > timedelta():
+                uptime += overlap
+        false_triggers = sum(1 for session_start in self.false_triggers.get(hs_id, ()) if session_start >= window_start)
+        return uptime.total_seconds() / 3600, false_triggers
+
+    ###returns the current rolling rates, same rate formula as get_individual_rates and get_overall_rates_over_time
+    def get_snapshot(self):
+        now = self.now()
+        snapshot = {"generated_at": datetime.now().isoformat(timespec='seconds'),
+                    "log_time": now.isoformat(timespec='seconds') if now else None,
+                    "connected_headsets": sorted(self.connected_since, key=get_headset_sort_key),
+                    "windows": {}}
+        if now is None:
+            return snapshot
+        self.prune(now)
+
+        all_headsets = sorted(set(self.uptime_intervals) | set(self.false_triggers), key=get_headset_sort_key)
+        for hours in self.windows_hours:
+            window_start = now - timedelta(hours=hours)
+            headset_data = {}
+            total_uptime = 0
+            total_false_triggers = 0
+            for hs_id in all_headsets:
+                uptime, false_triggers = self.get_window_counts(hs_id, window_start, now)
+                headset_data[hs_id] = {'uptime': uptime, 'false_triggers': false_triggers,
+                                       'rate': (false_triggers / uptime) * 100 if uptime > 0 else None}
+                if uptime > 0:
+                    total_uptime += uptime
+                    total_false_triggers += false_triggers
+            snapshot["windows"][f"{hours}h"] = {
+                "headsets": headset_data,
+                "overall": {'uptime': total_uptime, 'false_triggers': total_false_triggers,
+                            'rate': (total_false_triggers / total_uptime) * 100 if total_uptime > 0 else None}}
+        return snapshot
+
+###writes the snapshot next to itself first so readers never see a half written file
+def write_snapshot(snapshot, snapshot_path):
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = snapshot_path.with_suffix(snapshot_path.suffix + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(temp_path, snapshot_path)
+
+###long running live mode, tails both log directories and publishes a snapshot every poll
+###the snapshot is written to snapshot_path and, when a port is given, served as JSON on http://127.0.0.1:<port>/
+async def run_live_monitor(m4_log_path, path_to_ve_logs, selection, headsets=None,
+                           snapshot_path='GeneratedFiles/live_snapshot.json', port=None, poll_interval=0.5,
+                           windows_hours=LIVE_WINDOWS_HOURS):
+    monitor = LiveFalseAwakeningMonitor(get_criteria(selection), headsets, windows_hours)
+    # the first poll reads the existing (rotated) logs from the start, so headsets that connected before the monitor
+    # started have an uptime and the windows are filled right away, prune() drops what is older than the longest window
+    print("Seeding the live monitor from the existing logs...")
+    base_ext_tailer = LogDirectoryTailer(m4_log_path, "base_ext", from_end=False)
+    voice_tailer = LogDirectoryTailer(path_to_ve_logs, "voice_engine", from_end=False)
+    latest = {"snapshot": monitor.get_snapshot()}
+
+    async def serve_snapshot(reader, writer):
+        # the request itself does not matter, every path gets the latest snapshot
+        while (await reader.readline()).strip():
+            pass
+        body = json.dumps(latest["snapshot"]).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
+
+    server = None
+    if port is not None:
+        server = await asyncio.start_server(serve_snapshot, '127.0.0.1', port)
+        print(f"Serving live snapshots on http://127.0.0.1:{port}/")
+    print(f"Writing live snapshots to {snapshot_path}")
+
+    try:
+        while True:
+            base_ext_lines, voice_lines = await asyncio.gather(asyncio.to_thread(base_ext_tailer.read_new_lines),
+                                                               asyncio.to_thread(voice_tailer.read_new_lines))
+            for line in base_ext_lines:
+                monitor.add_base_ext_line(line)
+            for line in voice_lines:
+                monitor.add_voice_line(line)
+
+            latest["snapshot"] = monitor.get_snapshot()
+            write_snapshot(latest["snapshot"], snapshot_path)
+            await asyncio.sleep(poll_interval)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+#################################################################
+
+#############ANALYSIS SESSION FUNCTIONS####################
+
+###parses every log once and keeps the events and voice sessions of all headsets indexed by time in memory,
+###so queries for other dates, criteria, headsets and intervals don't have to read the logs again
+class AnalysisSession:
+    def __init__(self, m4_log_path, path_to_ve_logs):
+        print("Getting Headset Log Lines as a list...")
+        headset_on_off_raw_list, all_data = get_all_base_ext_headset_connected_duration(m4_log_path)
+        print("Indexing headset on/off events...")
+        self.events_per_headset = partition_on_off_events_by_headset(headset_on_off_raw_list, datetime.min, datetime.max)
+        self.event_timestamps_per_headset = {hs_id: [event[1] for event in events]
+                                             for hs_id, events in self.events_per_headset.items()}
+
+        print("Parsing Voice Engine Logs as list of voice sessions...")
+        sessions = []
+        for session in get_all_voice_sessions(path_to_ve_logs):
+            try:
+                session_date = datetime.strptime(session[1][1:18], "%m/%d/%y %H:%M:%S")
+            except (ValueError, IndexError):
+                continue
+            # the most likely outcome doesn't depend on the query, so every session is classified once here
+            this_session_data = get_voice_session_data(session)
+            if this_session_data is not None:
+                sessions.append((session_date, this_session_data))
+        sessions.sort(key=lambda session: session[0])
+        self.voice_dates = [session[0] for session in sessions]
+        self.voice_data = [session[1] for session in sessions]
+
+        # only numeric IDs can be selected at the prompt (see is_valid_headset_id), other values are log noise
+        self.all_headsets = sorted({hs_id for hs_id in set(self.events_per_headset) | {data['Headset ID'] for data in self.voice_data}
+                                    if hs_id.isdigit()}, key=get_headset_sort_key)
+        all_dates = self.voice_dates + [timestamps[0] for timestamps in self.event_timestamps_per_headset.values() if timestamps] \
+                    + [timestamps[-1] for timestamps in self.event_timestamps_per_headset.values() if timestamps]
+        self.first_date = min(all_dates) if all_dates else None
+        self.last_date = max(all_dates) if all_dates else None
+        self.durations_cache = {}
+        print(f"Loaded {sum(len(events) for events in self.events_per_headset.values())} headset events and "
+              f"{len(self.voice_data)} voice sessions for {len(self.all_headsets)} headsets")
+
+    ###same as process_data_set_for_duration, but only the events in the date range of the selected headsets are looked at
+    def get_durations(self, start_date, end_date, headsets):
+        cache_key = (start_date, end_date, tuple(headsets))
+        if cache_key not in self.durations_cache:
+            durations_dict = {}
+            for hs_id in headsets:
+                timestamps = self.event_timestamps_per_headset.get(hs_id, [])
+                events = self.events_per_headset.get(hs_id, [])[bisect.bisect_left(timestamps, start_date):bisect.bisect_right(timestamps, end_date)]
+                if any(event[0] == "on" for event in events):
+                    durations_dict[hs_id] = process_headset_events(hs_id, events)
+            self.durations_cache[cache_key] = durations_dict
+        return self.durations_cache[cache_key]
+
+    ###returns the voice data of the selected headsets with a session date in the date range
+    def get_voice_data(self, start_date, end_date, headsets):
+        selected = set(headsets)
+        first = bisect.bisect_left(self.voice_dates, start_date)
+        last = bisect.bisect_right(self.voice_dates, end_date)
+        return [data for data in self.voice_data[first:last] if data['Headset ID'] in selected]
+
+    ###returns the uptimes and false triggers per period of the requested interval, same shape as the
+    ###uptimes_and_false_triggers used by get_individual_rates, get_overall_rates_over_time and the plots
+    def query(self, start_date, end_date, selection, headsets, time_interval):
+        criteria = get_criteria(selection)
+        durations_dict = self.get_durations(start_date, end_date, headsets)
+        voice_data = self.get_voice_data(start_date, end_date, headsets)
+        correlate_voice_sessions_with_uptimes(voice_data, durations_dict)
+        aggregated = aggregate_uptimes_and_false_triggers(durations_dict, voice_data, criteria, headsets, start_date,
+                                                          time_interval, granularities=[])
+        return aggregated[get_granularity_key(time_interval)]
+
+###interactive prompt on top of an AnalysisSession, type help for the commands
+class AnalysisShell(cmd.Cmd):
+    intro = "Analysis session ready. Type help for the commands, quit to leave."
+    prompt = "(false awakenings) "
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+        self.start_date = session.first_date
+        self.end_date = session.last_date
+        self.selection = 2
+        self.headsets = session.all_headsets
+        self.time_interval = 7
+        self.rate_type = 1
+
+    def do_show(self, arg):
+        """show: prints the current query settings"""
+        print(f"Dates: {self.start_date} to {self.end_date}")
+        print(f"Criteria: {self.selection} ({', '.join(get_criteria(self.selection))})")
+        print(f"Headsets: {' '.join(self.headsets)}")
+        print(f"Interval: {get_interval_label(self.time_interval)}")
+        print(f"Rate: {'individual' if self.rate_type == 1 else 'overall'}")
+
+    def do_dates(self, arg):
+        """dates YYYY-MM-DD HH:MM:SS YYYY-MM-DD HH:MM:SS: sets the start and end date"""
+        parts = arg.split()
+        try:
+            start_date = datetime.strptime(" ".join(parts[0:2]), '%Y-%m-%d %H:%M:%S')
+            end_date = datetime.strptime(" ".join(parts[2:4]), '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            print("Invalid date format. Please enter both dates in the format 'YYYY-MM-DD HH:MM:SS'.")
+            return
+        self.start_date, self.end_date = start_date, end_date
+
+    def do_criteria(self, arg):
+        """criteria 1|2: 1 for less strict search criteria, 2 for more strict search criteria"""
+        if arg.strip() not in ['1', '2']:
+            print("Invalid selection. Please enter 1 or 2.")
+            return
+        self.selection = int(arg)
+
+    def do_headsets(self, arg):
+        """headsets <ID> [<ID> ...] | all: sets the headsets to look at"""
+        headsets = arg.split()
+        if headsets == ['all']:
+            self.headsets = self.session.all_headsets
+            return
+        invalid_headsets = [headset_id for headset_id in headsets if not is_valid_headset_id(headset_id)]
+        if not headsets or invalid_headsets:
+            print(f"Invalid headset IDs: {', '.join(invalid_headsets)}. Each ID must be a number with 1 to 2 digits.")
+            return
+        self.headsets = headsets
+
+    def do_interval(self, arg):
+        """interval <days>|hour|day|week|month: sets the time interval"""
+        arg = arg.strip().lower()
+        if arg in AGGREGATION_GRANULARITIES:
+            self.time_interval = arg
+        elif arg.isdigit() and int(arg) > 0:
+            self.time_interval = int(arg)
+        else:
+            print("Invalid selection. Please enter the time interval in number of days, or one of hour, day, week, month.")
+
+    def do_rates(self, arg):
+        """rates [individual|overall]: prints the false trigger rates for the current settings"""
+        self.set_rate_type(arg)
+        started = time.perf_counter()
+        uptimes_and_false_triggers = self.session.query(self.start_date, self.end_date, self.selection, self.headsets, self.time_interval)
+        if self.rate_type == 1:
+            get_individual_rates(uptimes_and_false_triggers, self.time_interval)
+        else:
+            for period, rate in get_overall_rates_over_time(uptimes_and_false_triggers).items():
+                rate = f"{rate:.2f}%" if rate is not None else "N/A (Uptime is 0)"
+                print(f"  Time interval from {format_period_boundary(period[0], self.time_interval)} to {format_period_boundary(period[1], self.time_interval)}: {rate}")
+        print(f"(answered in {time.perf_counter() - started:.2f} s)")
+
+    def do_plot(self, arg):
+        """plot [individual|overall] [output.png]: plots the rates, saved to the file when one is given
+        individual rates of too many headsets for one subplot each are saved as an overview next to the file instead"""
+        parts = arg.split()
+        if parts and parts[0] in ['individual', 'overall']:
+            self.set_rate_type(parts.pop(0))
+        output_path = parts[0] if parts else None
+        started = time.perf_counter()
+        uptimes_and_false_triggers = self.session.query(self.start_date, self.end_date, self.selection, self.headsets, self.time_interval)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if self.rate_type == 1:
+                rates = get_individual_rates(uptimes_and_false_triggers, self.time_interval)
+            else:
+                rates = get_overall_rates_over_time(uptimes_and_false_triggers)
+        if not rates:
+            print("No data for the current settings.")
+            return
+        if self.rate_type == 1 and len(rates) > INDIVIDUAL_PLOT_MAX_HEADSETS:
+            # same switch as the batch flow
+            print(f"More than {INDIVIDUAL_PLOT_MAX_HEADSETS} headsets, saving an overview instead.")
+            output_dir = Path(output_path).parent if output_path is not None else 'GeneratedFiles'
+            self.save_overview(rates, uptimes_and_false_triggers, output_dir, started)
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            if self.rate_type == 1:
+                plot_individual_headset_data(rates, uptimes_and_false_triggers, self.time_interval, output_path, block=False)
+            else:
+                plot_overall_rates(rates, uptimes_and_false_triggers, self.time_interval, output_path, block=False)
+        if output_path is not None:
+            print(f"Saved plot to {output_path} (in {time.perf_counter() - started:.2f} s)")
+
+    def do_overview(self, arg):
+        """overview [output directory]: saves paged small multiples and a heatmap of every selected headset's rates"""
+        output_dir = arg.strip() or 'GeneratedFiles'
+        started = time.perf_counter()
+        uptimes_and_false_triggers = self.session.query(self.start_date, self.end_date, self.selection, self.headsets, self.time_interval)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rates = get_individual_rates(uptimes_and_false_triggers, self.time_interval)
+        if not rates:
+            print("No data for the current settings.")
+            return
+        self.save_overview(rates, uptimes_and_false_triggers, output_dir, started)
+
+    def save_overview(self, rates, uptimes_and_false_triggers, output_dir, started):
+        page_paths = plot_headset_small_multiples(rates, uptimes_and_false_triggers, self.time_interval, output_dir)
+        heatmap_path = plot_rate_heatmap(rates, uptimes_and_false_triggers, self.time_interval,
+                                         Path(output_dir) / 'headset_rate_heatmap.png')
+        print(f"Saved {len(page_paths)} overview pages and {heatmap_path} (in {time.perf_counter() - started:.2f} s)")
+
+    ###an error in one command is printed and the session keeps running, so the parsed logs are not lost
+    def onecmd(self, line):
+        try:
+            return super().onecmd(line)
+        except Exception as e:
+            print(f"Error running '{line}': {e}")
+            return False
+
+    def set_rate_type(self, arg):
+        if arg.strip() == 'individual':
+            self.rate_type = 1
+        elif arg.strip() == 'overall':
+            self.rate_type = 2
+
+    def do_quit(self, arg):
+        """quit: leaves the analysis session"""
+        return True
+
+    do_exit = do_quit
+    do_EOF = do_quit
+
+#################################################################
+
 def get_valid_date(prompt):
     while True:
         date_str = input(prompt)
@@ -802,18 +1904,47 @@ def get_selection(prompt):
 
 def get_time_interval():
     while True:
-        selection = input("How many days at a time would you like to retrieve false awakening data for? Enter as a number: ")
-        if selection == '':
-            print("Invalid selection. Please enter the time interval in number of days.")
-        else:
+        selection = input("How many days at a time would you like to retrieve false awakening data for? Enter as a number (or hour, day, week, month for calendar intervals): ").strip().lower()
+        if selection in AGGREGATION_GRANULARITIES:
+            return selection
+        elif selection.isdigit() and int(selection) > 0:
             return int(selection)
+        else:
+            print("Invalid selection. Please enter the time interval in number of days, or one of hour, day, week, month.")
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--m4_log_path', nargs='+', default=['C:/Users/mmarks/MykahFiles/Projects/FalseAwakenings/SYSTEM/logs/enc/m4/'],
+                        help='one or more m4 log directories, logs shared by overlapping bundles are only parsed once')
+    parser.add_argument('--ve_log_path', nargs='+', default=['C:/Users/mmarks/MykahFiles/Projects/FalseAwakenings/SYSTEM/logs/enc/voice_engine/'],
+                        help='one or more voice engine log directories, logs shared by overlapping bundles are only parsed once')
+    parser.add_argument('--live', action='store_true', help='tail the logs and publish rolling false awakening rates')
+    parser.add_argument('--snapshot_path', default='GeneratedFiles/live_snapshot.json', help='where --live writes its JSON snapshots')
+    parser.add_argument('--port', type=int, default=None, help='also serve --live snapshots as JSON on this local port')
+    parser.add_argument('--session', action='store_true', help='parse the logs once and answer repeated queries at an interactive prompt')
+    args = parser.parse_args()
+
     ##get headset on off list
-    m4_log_path = 'C:/Users/mmarks/MykahFiles/Projects/FalseAwakenings/SYSTEM/logs/enc/m4/'
-    path_to_ve_logs = 'C:/Users/mmarks/MykahFiles/Projects/FalseAwakenings/SYSTEM/logs/enc/voice_engine/'
+    m4_log_path = args.m4_log_path
+    path_to_ve_logs = args.ve_log_path
+
+    if args.live:
+        search_criteria = get_selection("\nEnter 1 for less strict search criteria, 2 for more strict search criteria (regarding Most Likely Outcome categories): ")
+        headsets = get_valid_headset_ids()
+        print("M4 Log Path: " + ", ".join(m4_log_path))
+        print("Voice Engine Log Path: " + ", ".join(path_to_ve_logs))
+        try:
+            asyncio.run(run_live_monitor(m4_log_path, path_to_ve_logs, search_criteria, headsets, args.snapshot_path, args.port))
+        except KeyboardInterrupt:
+            print("Live monitoring stopped.")
+        sys.exit(0)
 
+    if args.session:
+        print("M4 Log Path: " + ", ".join(m4_log_path))
+        print("Voice Engine Log Path: " + ", ".join(path_to_ve_logs))
+        AnalysisShell(AnalysisSession(m4_log_path, path_to_ve_logs)).cmdloop()
+        sys.exit(0)
 
     start_date = get_valid_date("Please enter the start date you would like to retrieve data for in the format 'YYYY-MM-DD HH:MM:SS' where the time is according to a 24 hour clock.")
     end_date = get_valid_date("Please enter the end date you would like to retrieve data for in the format 'YYYY-MM-DD HH:MM:SS' where the time is according to a 24 hour clock.")
@@ -831,23 +1962,32 @@ if __name__ == '__main__':
         # end_date = "2024-10-23 11:30:00"
         end_date = "2025-01-01 23:59:59"
 
-    print("M4 Log Path: " + m4_log_path)
-    print("Voice Engine Log Path: " + path_to_ve_logs)
+    print("M4 Log Path: " + ", ".join(m4_log_path))
+    print("Voice Engine Log Path: " + ", ".join(path_to_ve_logs))
 
     ##process headset durations
     print("--------------------PROCESSING HEADSET DATA-------------------")
-    raw_list, durations_dict, total_uptime_hours, uptimes_hours_per_interval = get_hs_durations(m4_log_path, start_date, end_date, time_interval)
+    raw_list, durations_dict, total_uptime_hours = get_hs_durations(m4_log_path, start_date, end_date, headsets)
 
 
     ##get voice data
     print("--------------------PROCESSING VOICE DATA-------------------")
 
-    voice_logs_as_str, all_voice_sessions_list, voice_data_dict, false_awakening_data, uptimes_and_false_triggers = get_false_awakening_data_bound(path_to_ve_logs, start_date, end_date, search_criteria, headsets, uptimes_hours_per_interval, time_interval)
+    all_voice_sessions_list, voice_data_dict, false_awakening_data, uptimes_and_false_triggers_by_granularity = get_false_awakening_data_bound(path_to_ve_logs, start_date, end_date, search_criteria, headsets, durations_dict, time_interval)
+
+    ##every granularity is aggregated in the same pass, rates and plots read the one that was asked for
+    uptimes_and_false_triggers = uptimes_and_false_triggers_by_granularity[get_granularity_key(time_interval)]
 
 
     if rate_type == 1:
-        rates = get_individual_rates(uptimes_and_false_triggers)
-        plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interval)
+        rates = get_individual_rates(uptimes_and_false_triggers, time_interval)
+        if len(rates) > INDIVIDUAL_PLOT_MAX_HEADSETS:
+            ##too many headsets for one subplot each, draw fixed size pages and a heatmap instead
+            page_paths = plot_headset_small_multiples(rates, uptimes_and_false_triggers, time_interval)
+            heatmap_path = plot_rate_heatmap(rates, uptimes_and_false_triggers, time_interval)
+            print(f"Saved {len(page_paths)} overview pages to {page_paths[0].parent} and the heatmap to {heatmap_path}")
+        else:
+            plot_individual_headset_data(rates, uptimes_and_false_triggers, time_interval)
     elif rate_type == 2:
         rates = get_overall_rates_over_time(uptimes_and_false_triggers)
         plot_overall_rates(rates, uptimes_and_false_triggers, time_interval)